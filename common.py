@@ -0,0 +1,245 @@
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+
+APT_PKGCACHE = "/var/cache/apt/pkgcache.bin"
+MODULEFILES_DIR = os.path.expanduser("~/compiler_modulefiles")
+VERIFY_CACHE = os.path.expanduser("~/compiler_installation/.cache.json")
+
+@functools.lru_cache(maxsize=None)
+def check_command(command):
+    return shutil.which(command) is not None
+
+def packages_installed(packages):
+    # A single dpkg-query lets warm runs skip apt entirely.
+    result = subprocess.run(["dpkg-query", "-W", "-f=${Status}\n", *packages], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    statuses = result.stdout.splitlines()
+    return result.returncode == 0 and all(status == "install ok installed" for status in statuses)
+
+def apt_cache_stale():
+    # Only refresh the package lists if apt has not done so in the last hour.
+    try:
+        return time.time() - os.path.getmtime(APT_PKGCACHE) > 3600
+    except OSError:
+        return True
+
+def apt_install(packages):
+    if packages_installed(packages):
+        print("Required packages are already installed.")
+        return
+
+    print("Installing required packages...")
+    try:
+        if apt_cache_stale():
+            subprocess.run(["sudo", "apt-get", "update"], check=True)
+        subprocess.run(["sudo", "apt-get", "install", "--no-install-recommends", "-y", *packages], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error installing packages: {e}")
+        sys.exit(1)
+
+def download(*urls, output=None):
+    # Fetch over multiple connections with aria2c, falling back to wget.
+    # -c resumes a partial file, -N skips it if already up to date. aria2c
+    # names files from Content-Disposition rather than the URL, so pass output
+    # to pin the name of a single download.
+    if check_command("aria2c"):
+        subprocess.run([
+            "aria2c",
+            "-x16",
+            "-s16",
+            f"-j{len(urls)}",
+            "-c",
+            "--auto-file-renaming=false",
+            *(["-o", output] if output else []),
+            *urls
+        ], check=True)
+    elif output:
+        # wget ignores -N together with -O, so only resume.
+        subprocess.run(["wget", "-c", "-O", output, *urls], check=True)
+    else:
+        subprocess.run(["wget", "-c", "-N", *urls], check=True)
+
+class ProgressReader:
+    """File-like wrapper that prints a download progress bar as it is read."""
+
+    REDRAW_BYTES = 8 * 1024 * 1024  # Redraw every 8 MiB rather than on every read
+
+    def __init__(self, raw, total_size):
+        self.raw = raw
+        self.total_size = total_size
+        self.downloaded_size = 0
+        self.next_redraw = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.downloaded_size += len(data)
+        if self.downloaded_size >= self.next_redraw or not data:
+            self.next_redraw = self.downloaded_size + self.REDRAW_BYTES
+            self.draw()
+            if not data:
+                print()
+        return data
+
+    def draw(self):
+        downloaded_mb = self.downloaded_size / (1024 * 1024)
+        if self.total_size:
+            done = int(50 * self.downloaded_size / self.total_size)  # Progress bar length
+            sys.stdout.write(f"\r[{'#' * done}{'-' * (50 - done)}] {downloaded_mb:.2f} MB / {self.total_size / (1024 * 1024):.2f} MB")
+        else:
+            sys.stdout.write(f"\r{downloaded_mb:.2f} MB")
+        sys.stdout.flush()
+
+def stream_extract(url, dest=".", tar_options=()):
+    # Pipe a .tar.gz into tar/pigz as it arrives instead of writing it to disk
+    # and reading it back. tar_options are passed through, e.g. --exclude.
+    # requests is imported here because only the GCC and LLVM installers stream,
+    # and they install python3-requests through apt_install before calling this.
+    import requests
+
+    response = requests.get(url, stream=True)
+    response.raise_for_status()  # Raise an error for bad responses
+    response.raw.decode_content = True
+
+    total_size = int(response.headers.get('content-length', 0))
+    tar = subprocess.Popen(["tar", "--use-compress-program=pigz", "-xf", "-", "-C", dest, *tar_options], stdin=subprocess.PIPE)
+    try:
+        reader = ProgressReader(response.raw, total_size)
+        shutil.copyfileobj(reader, tar.stdin, length=1024 * 1024)  # 1 MiB reads
+    finally:
+        tar.stdin.close()
+    if tar.wait() != 0:
+        raise subprocess.CalledProcessError(tar.returncode, tar.args)
+
+def remote_size(url):
+    # Content-Length from a HEAD request, or None if the server won't say.
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="HEAD")) as response:
+            length = response.headers.get("Content-Length")
+            return int(length) if length else None
+    except (OSError, ValueError):
+        return None
+
+def archive_intact(path):
+    # Structural check only: tar can list an archive cut off at a member
+    # boundary without error, so completeness comes from the size check.
+    if path.endswith(".gz"):
+        command = ["pigz", "-t", path]
+    elif path.endswith(".tar"):
+        command = ["tar", "-tf", path]
+    else:
+        return True
+    return subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+def verify_download(path, expected_size=None):
+    # Remember files that already passed so unchanged downloads are not re-read.
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = [stat.st_mtime, stat.st_size, expected_size]
+
+    if expected_size is not None and stat.st_size != expected_size:
+        return False
+
+    try:
+        with open(VERIFY_CACHE, 'r') as f:
+            cache = json.load(f)
+    except (IOError, ValueError):
+        cache = {}
+
+    if cache.get(path) == key:
+        return True
+    if not archive_intact(path):
+        return False
+
+    cache[path] = key
+    try:
+        os.makedirs(os.path.dirname(VERIFY_CACHE), exist_ok=True)
+        with open(VERIFY_CACHE, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except IOError as e:
+        print(f"Warning: could not update {VERIFY_CACHE}: {e}")
+    return True
+
+def download_verified(url, path=None):
+    # Download url into the current directory (as path, by default the last
+    # component of the URL), fetching it again from scratch if it turns out
+    # to be corrupt.
+    path = path or os.path.basename(url)
+    expected_size = remote_size(url)
+    if expected_size is None:
+        print(f"Warning: server did not report the size of '{path}'; only checking the archive structure.")
+
+    download(url, output=path)
+    if not verify_download(path, expected_size):
+        print(f"'{path}' is incomplete or corrupt. Downloading it again...")
+        os.remove(path)
+        download(url, output=path)
+        if not verify_download(path, expected_size):
+            raise IOError(f"'{path}' is still corrupt after downloading it again")
+    return path
+
+# setenv and prepend_path map variable names to values, which may refer to the
+# install directory as ${topdir}.
+def write_modulefile(name, description, version, install_dir, setenv, prepend_path):
+    modulefile_dir = os.path.join(MODULEFILES_DIR, name)
+    os.makedirs(modulefile_dir, exist_ok=True)
+
+    modulefile_path = os.path.join(modulefile_dir, f"{name}-{version}")
+
+    env_lines = [f"setenv {var} {value}" for var, value in setenv.items()]
+    env_lines += [f"prepend-path {var} {value}" for var, value in prepend_path.items()]
+
+    try:
+        with open(modulefile_path, 'w') as f:
+            f.write(f"""#%Module1.0
+
+proc ModulesHelp {{ }} {{
+    global version modroot
+    puts stderr "{description} version {version} - sets the environment for {name}-{version}"
+}}
+
+module-whatis "Sets the environment for {description} version {version}"
+
+set topdir {install_dir}
+set version {version}
+
+""")
+            f.write("\n".join(env_lines) + "\n")
+    except IOError as e:
+        print(f"Error creating module file: {e}")
+        sys.exit(1)
+
+    return modulefile_path
+
+def update_bashrc():
+    bashrc_path = os.path.expanduser("~/.bashrc")
+
+    try:
+        # Scan line by line so commented-out or unrelated MODULEPATH lines don't count.
+        with open(bashrc_path, 'a+') as bashrc:
+            bashrc.seek(0)
+            line = ""
+            for line in bashrc:
+                if line.lstrip().startswith("export MODULEPATH=") and "$HOME/compiler_modulefiles" in line:
+                    print("MODULEPATH already exists in .bashrc.")
+                    return False
+
+            # Don't glue the export onto a last line that lacks a newline.
+            if line and not line.endswith('\n'):
+                bashrc.write('\n')
+            bashrc.write('export MODULEPATH=${MODULEPATH}:$HOME/compiler_modulefiles\n')
+
+        print("Added MODULEPATH to .bashrc.")
+
+        # Inform user to source .bashrc
+        print("Please run 'source ~/.bashrc' or restart your terminal to update your environment.")
+
+        return True
+
+    except IOError as e:
+        print(f"Error updating .bashrc: {e}")
+        sys.exit(1)
@@ -1,75 +1,42 @@
 #!/usr/bin/python3
 
 import os
+import shutil
 import subprocess
 import sys
-import requests
-import tarfile
-import sys
+
+from common import apt_install, stream_extract, update_bashrc, write_modulefile
+
+REQUIRED_APT = ["build-essential", "libmpfr-dev", "libgmp-dev", "libmpc-dev", "pigz", "python3-requests", "environment-modules"]
 
 def usage():
     print("Usage: python install_gcc.py [version]")
     print("Example: python install_gcc.py 14.2.0")
     sys.exit(1)
 
-def check_command(command):
-    return subprocess.call(f"command -v {command}", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0
-
-def install_packages():
-    print("Installing required packages...")
-    try:
-        subprocess.run(["sudo", "apt", "update"], check=True)
-        subprocess.run(["sudo", "apt", "install", "build-essential", "libmpfr-dev", "libgmp3-dev", "libmpc-dev", "-y"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error installing packages: {e}")
-        sys.exit(1)
-
-def install_environment_modules():
-    if not check_command("module"):
-        print("Installing environment-modules...")
-        try:
-            subprocess.run(["sudo", "apt", "install", "--no-install-recommends", "environment-modules", "-y"], check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing environment-modules: {e}")
-            sys.exit(1)
-
 def download_gcc(version):
-    tarball = f"gcc-{version}.tar.gz"
-    if not os.path.isfile(tarball):
-        print(f"Downloading GCC version {version}...")
-        url = f"http://ftp.gnu.org/gnu/gcc/gcc-{version}/{tarball}"
-        
+    source_dir = f"gcc-{version}"
+    if not os.path.isdir(source_dir):
+        print(f"Downloading and extracting GCC version {version}...")
+        url = f"http://ftp.gnu.org/gnu/gcc/gcc-{version}/gcc-{version}.tar.gz"
+
+        # Extract into a staging directory and only move the tree into place
+        # once tar succeeds, so an interrupted run never leaves a partial
+        # gcc-<version> that looks like a finished download.
+        partial_dir = f"{source_dir}.partial"
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        os.makedirs(partial_dir)
+
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()  # Raise an error for bad responses
-            
-            total_size = int(response.headers.get('content-length', 0))
-            with open(tarball, 'wb') as file:
-                downloaded_size = 0
-                chunk_size = 1024  # 1 KB chunks
-                for data in response.iter_content(chunk_size=chunk_size):
-                    file.write(data)
-                    downloaded_size += len(data)
-                    # Print progress
-                    done = int(50 * downloaded_size / total_size)  # Progress bar length
-                    sys.stdout.write(f"\r[{'#' * done}{'-' * (50 - done)}] {downloaded_size / (1024 * 1024):.2f} MB / {total_size / (1024 * 1024):.2f} MB")
-                    sys.stdout.flush()
-            print()  
-            
+            stream_extract(url, partial_dir)
+            os.rename(os.path.join(partial_dir, source_dir), source_dir)
         except Exception as e:
             print(f"Error downloading GCC: {e}")
             sys.exit(1)
+        finally:
+            shutil.rmtree(partial_dir, ignore_errors=True)
     else:
-        print(f"GCC tarball '{tarball}' already exists. Skipping download.")
-
-def extract_gcc(version):
-    print("Extracting GCC...")
-    try:
-        with tarfile.open(f"gcc-{version}.tar.gz", "r:gz") as tar:
-            tar.extractall()
-    except Exception as e:
-        print(f"Error extracting GCC: {e}")
-        sys.exit(1)
+        print(f"GCC source directory '{source_dir}' already exists. Skipping download.")
 
 def configure_gcc(version, install_dir):
     print("Configuring GCC...")
@@ -92,7 +59,9 @@ def configure_gcc(version, install_dir):
 def compile_gcc():
     print("Compiling GCC... This may take some time.")
     try:
-        subprocess.run(["make", "-j64"], shell=True, check=True)
+        # Pass the job count as a real argument; with shell=True the list form
+        # silently dropped "-j" and built serially.
+        subprocess.run(["make", f"-j{os.cpu_count()}"], check=True)
     except subprocess.CalledProcessError as e:
         print(f"Compilation failed: {e}")
         sys.exit(1)
@@ -106,60 +75,14 @@ def install_gcc():
         sys.exit(1)
 
 def create_module_file(version, install_dir):
-    modulefile_dir = os.path.expanduser(f"~/compiler_modulefiles/gcc")
-    os.makedirs(modulefile_dir, exist_ok=True)
-    
-    modulefile_path = os.path.join(modulefile_dir, f"gcc-{version}")
-    
-    try:
-        with open(modulefile_path, 'w') as f:
-            f.write(f"""#%Module1.0
-
-proc ModulesHelp {{ }} {{
-    global version modroot
-    puts stderr "GCC version {version} - sets the environment for gcc-{version}"
-}}
-
-module-whatis "Sets the environment for GCC version {version}"
-
-set topdir {install_dir}
-set version {version}
-
-setenv CC ${{topdir}}/bin/gcc
-setenv CXX ${{topdir}}/bin/g++
-setenv FC ${{topdir}}/bin/gfortran
-prepend-path PATH ${{topdir}}/bin
-prepend-path LD_LIBRARY_PATH ${{topdir}}/lib
-""")
-    except IOError as e:
-        print(f"Error creating module file: {e}")
-        sys.exit(1)
-
-def update_bashrc():
-    bashrc_path = os.path.expanduser("~/.bashrc")
-    
-    try:
-        # Read existing .bashrc content to check for MODULEPATH
-        with open(bashrc_path, 'r') as bashrc:
-            content = bashrc.read()
-        
-        # Append MODULEPATH if it doesn't exist
-        if 'export MODULEPATH' not in content:
-            with open(bashrc_path, 'a') as bashrc:
-                bashrc.write('export MODULEPATH=${MODULEPATH}:$HOME/compiler_modulefiles\n')
-                print("Added MODULEPATH to .bashrc.")
-                
-                # Inform user to source .bashrc
-                print("Please run 'source ~/.bashrc' or restart your terminal to update your environment.")
-                
-                return True
-        else:
-            print("MODULEPATH already exists in .bashrc.")
-            return False
-            
-    except IOError as e:
-        print(f"Error updating .bashrc: {e}")
-        sys.exit(1)
+    write_modulefile("gcc", "GCC", version, install_dir, setenv={
+        "CC": "${topdir}/bin/gcc",
+        "CXX": "${topdir}/bin/g++",
+        "FC": "${topdir}/bin/gfortran",
+    }, prepend_path={
+        "PATH": "${topdir}/bin",
+        "LD_LIBRARY_PATH": "${topdir}/lib",
+    })
 
 def main():
    if len(sys.argv) < 2:
@@ -186,15 +109,10 @@ def main():
    os.makedirs(install_dir, exist_ok=True)
 
    # Install required packages
-   install_packages()
-
-   # Install environment modules
-   install_environment_modules()
+   apt_install(REQUIRED_APT)
 
    # Download and extract GCC
    download_gcc(version)
-   
-   extract_gcc(version)
 
    # Configure and compile GCC
    configure_gcc(version, install_dir)
@@ -1,34 +1,23 @@
 #!/usr/bin/python3
 
+import argparse
+import concurrent.futures
 import os
 import subprocess
 import sys
 
-def usage():
-    print("Usage: python install_intel.py [version]")
-    print("Example: python install_intel.py 2025.0")
-    sys.exit(1)
+from common import apt_install, download, update_bashrc, write_modulefile
 
-def check_command(command):
-    return subprocess.call(f"command -v {command}", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0
+# main() installs from pre-downloaded .sh files; add "wget", "aria2" and
+# "ca-certificates" back if the download_intel_toolkit call is re-enabled.
+REQUIRED_APT = ["build-essential", "environment-modules"]
 
-def install_packages():
-    print("Installing required packages...")
-    try:
-        subprocess.run(["sudo", "apt", "update"], check=True)
-        subprocess.run(["sudo", "apt", "install", "build-essential", "wget", "-y"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error installing packages: {e}")
-        sys.exit(1)
-
-def install_environment_modules():
-    if not check_command("module"):
-        print("Installing environment-modules...")
-        try:
-            subprocess.run(["sudo", "apt", "install", "--no-install-recommends", "environment-modules", "-y"], check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing environment-modules: {e}")
-            sys.exit(1)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Install the Intel oneAPI Base and HPC Toolkits.", epilog="Example: python install_intel.py 2025.0")
+    parser.add_argument("version", help="toolkit version, e.g. 2025.0")
+    parser.add_argument("--parallel", action="store_true",
+                        help="run the Base and HPC installers concurrently (needs several GB of RAM per installer)")
+    return parser.parse_args()
 
 def download_intel_toolkit(version):
     print(f"Downloading Intel oneAPI Base and HPC Toolkits version {version}...")
@@ -37,98 +26,58 @@ def download_intel_toolkit(version):
     base_toolkit_url = "https://registrationcenter-download.intel.com/akdlm/IRC_NAS/dfc4a434-838c-4450-a6fe-2fa903b75aa7/intel-oneapi-base-toolkit-2025.0.1.46_offline.sh"
     hpc_toolkit_url = "https://registrationcenter-download.intel.com/akdlm/IRC_NAS/b7f71cf2-8157-4393-abae-8cea815509f7/intel-oneapi-hpc-toolkit-2025.0.1.47_offline.sh"
 
+    # Fetch both installers concurrently.
     try:
-        subprocess.run(["wget", base_toolkit_url], check=True)
-        subprocess.run(["wget", hpc_toolkit_url], check=True)
+        download(base_toolkit_url, hpc_toolkit_url)
     except subprocess.CalledProcessError as e:
         print(f"Error downloading toolkits: {e}")
         sys.exit(1)
 
-def extract_and_install(install_dir):
+def extract_and_install(install_dir, parallel=False):
     print("Installing Intel oneAPI Toolkits silently...")
     
     try:
         os.makedirs(install_dir, exist_ok=True)
 
         # Silent installation commands for both toolkits
-        subprocess.run([
+        installers = [[
             "sh", 
-            "intel-oneapi-base-toolkit-2025.0.1.46_offline.sh", 
+            installer,
             "-a", 
             "--silent", 
             "--eula=accept", 
             f"--install-dir={install_dir}"
-        ], check=True)
-        
-        subprocess.run([
-            "sh", 
-            "intel-oneapi-hpc-toolkit-2025.0.1.47_offline.sh", 
-            "-a", 
-            "--silent", 
-            "--eula=accept",
-            f"--install-dir={install_dir}"
-        ], check=True)
+        ] for installer in ["intel-oneapi-base-toolkit-2025.0.1.46_offline.sh", "intel-oneapi-hpc-toolkit-2025.0.1.47_offline.sh"]]
+
+        if parallel:
+            # Opt-in only: both kits install into the same --install-dir and
+            # share overlapping components (e.g. the compiler tree) as well as
+            # the Intel installer's own package state, and each installer
+            # peaks at several GB RSS.
+            with concurrent.futures.ThreadPoolExecutor(len(installers)) as executor:
+                futures = [executor.submit(subprocess.run, command, check=True) for command in installers]
+                for future in futures:
+                    future.result()
+        else:
+            for command in installers:
+                subprocess.run(command, check=True)
 
     except subprocess.CalledProcessError as e:
         print(f"Error during installation process: {e}")
         sys.exit(1)
 
 def create_module_file(version, install_dir):
-    modulefile_dir = os.path.expanduser(f"~/compiler_modulefiles/intel")
-    os.makedirs(modulefile_dir, exist_ok=True)
-    
-    modulefile_path = os.path.join(modulefile_dir, f"intel-{version}")
-    
-    try:
-        with open(modulefile_path, 'w') as f:
-            f.write(f"""#%Module1.0
-
-proc ModulesHelp {{ }} {{
-    global version modroot
-    puts stderr "Intel oneAPI Base and HPC Toolkits version {version} - sets the environment for intel-{version}"
-}}
-
-module-whatis "Sets the environment for Intel oneAPI Base and HPC Toolkits version {version}"
-
-set topdir {install_dir}
-set version {version}
-
-setenv CC ${{topdir}}/compiler/bin/icx
-setenv CXX ${{topdir}}/compiler/bin/icpx
-prepend-path PATH ${{topdir}}/compiler/bin
-prepend-path LD_LIBRARY_PATH ${{topdir}}/compiler/lib
-""")
-    except IOError as e:
-        print(f"Error creating module file: {e}")
-        sys.exit(1)
-
-def update_bashrc():
-    bashrc_path = os.path.expanduser("~/.bashrc")
-    
-    try:
-        with open(bashrc_path, 'r') as bashrc:
-            content = bashrc.read()
-        
-        if 'export MODULEPATH' not in content:
-            with open(bashrc_path, 'a') as bashrc:
-                bashrc.write('export MODULEPATH=${MODULEPATH}:$HOME/compiler_modulefiles\n')
-                print("Added MODULEPATH to .bashrc.")
-                print("Please run 'source ~/.bashrc' or restart your terminal to update your environment.")
-                
-                return True
-        else:
-            print("MODULEPATH already exists in .bashrc.")
-            return False
-            
-    except IOError as e:
-        print(f"Error updating .bashrc: {e}")
-        sys.exit(1)
+    write_modulefile("intel", "Intel oneAPI Base and HPC Toolkits", version, install_dir, setenv={
+        "CC": "${topdir}/compiler/bin/icx",
+        "CXX": "${topdir}/compiler/bin/icpx",
+    }, prepend_path={
+        "PATH": "${topdir}/compiler/bin",
+        "LD_LIBRARY_PATH": "${topdir}/compiler/lib",
+    })
 
 def main():
-   if len(sys.argv) < 2:
-       usage()
-   
-   version = sys.argv[1]
+   args = parse_args()
+   version = args.version
    
    install_dir = os.path.expanduser(f"~/compiler_installation/intel-{version}")
 
@@ -139,10 +88,9 @@ def main():
        return
 
    os.makedirs(install_dir, exist_ok=True)
-   install_packages()
-   install_environment_modules()
+   apt_install(REQUIRED_APT)
 #    download_intel_toolkit(version)
-   extract_and_install(install_dir)
+   extract_and_install(install_dir, args.parallel)
    create_module_file(version, install_dir)
    update_bashrc()
 
@@ -1,70 +1,63 @@
 #!/usr/bin/python3
 
 import os
+import shutil
 import subprocess
 import sys
-import tarfile
-import sys
+
+from common import apt_install, stream_extract, update_bashrc, write_modulefile
+
+REQUIRED_APT = ["build-essential", "cmake", "ninja-build", "ccache", "lld", "pigz", "python3-requests", "ca-certificates", "environment-modules"]
+
+# Subdirectories of llvm-project the enabled projects never use. They are
+# excluded rather than listing what to keep, so a tree that a given release
+# lacks is simply ignored instead of failing the extraction.
+LLVM_UNUSED_DIRS = ["libcxx", "libcxxabi", "libc", "libclc", "bolt", "polly", "compiler-rt", "lldb", "llvm-libgcc", "pstl", "cross-project-tests", "utils/bazel"]
 
 def usage():
     print("Usage: python install_llvm.py [version]")
     print("Example: python install_llvm.py 19.1.3")
     sys.exit(1)
 
-def check_command(command):
-    return subprocess.call(f"command -v {command}", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0
-
-def install_packages():
-    print("Installing required packages...")
+def download_llvm(version):
+    # llvm-project is not versioned by name, so a stamp file records which
+    # release it holds; only an extraction that completed writes it.
+    stamp = os.path.join("llvm-project", ".llvm-version")
     try:
-        subprocess.run(["sudo", "apt", "update"], check=True)
-        subprocess.run(["sudo", "apt", "install", "build-essential", "cmake", "wget", "-y"], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error installing packages: {e}")
-        sys.exit(1)
+        with open(stamp, 'r') as f:
+            if f.read().strip() == version:
+                print("LLVM source directory 'llvm-project' already exists. Skipping download.")
+                return
+    except IOError:
+        pass
 
-def install_environment_modules():
-    if not check_command("module"):
-        print("Installing environment-modules...")
-        try:
-            subprocess.run(["sudo", "apt", "install", "--no-install-recommends", "environment-modules", "-y"], check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error installing environment-modules: {e}")
-            sys.exit(1)
+    print(f"Downloading and extracting LLVM version {version}...")
+    url = f"https://github.com/llvm/llvm-project/archive/refs/tags/llvmorg-{version}.tar.gz"
 
-def download_llvm(version):
-    tarball = f"llvmorg-{version}.tar.gz"
-    if not os.path.isfile(tarball):
-        print(f"Downloading LLVM version {version}...")
-        url = f"https://github.com/llvm/llvm-project/archive/refs/tags/llvmorg-{version}.tar.gz"
-
-        try:
-            subprocess.run(["wget", url], check=True)
-            print("Download completed.")
-        except subprocess.CalledProcessError as e:
-            print(f"Error downloading LLVM: {e}")
-            sys.exit(1)
-    else:
-        print(f"LLVM tarball '{tarball}' already exists. Skipping download.")
-
-def extract_llvm(version):
-    print("Extracting LLVM...")
-    try:
-        subprocess.run(["tar", "xvf", f"llvmorg-{version}.tar.gz"], check=True)
-        subprocess.run(["mv", f"llvm-project-llvmorg-{version}", "llvm-project"], check=True)
-    except Exception as e:
-        print(f"Error extracting LLVM: {e}")
-        sys.exit(1)
+    # Skip the parts of the monorepo the build does not use.
+    top_dir = f"llvm-project-llvmorg-{version}"
+    excludes = ["--anchored", *[f"--exclude={top_dir}/{subdir}" for subdir in LLVM_UNUSED_DIRS]]
+
+    shutil.rmtree(top_dir, ignore_errors=True)  # Leftovers from an interrupted run
 
-def extract_gcc(version):
-    print("Extracting LLVM...")
     try:
-        with tarfile.open(f"llvmorg-{version}.tar.gz", "r:gz") as tar:
-            tar.extractall()
+        stream_extract(url, tar_options=excludes)
+        # Unlike mv, os.rename refuses to replace a non-empty directory, so
+        # clear out any stale llvm-project left by an earlier run first.
+        shutil.rmtree("llvm-project", ignore_errors=True)
+        os.rename(top_dir, "llvm-project")
+        with open(stamp, 'w') as f:
+            f.write(version + "\n")
     except Exception as e:
-        print(f"Error extracting LLVM: {e}")
+        print(f"Error downloading LLVM: {e}")
+        shutil.rmtree(top_dir, ignore_errors=True)
         sys.exit(1)
 
+def parallel_link_jobs():
+    # LLVM links need several GB each, so budget roughly one link job per 8 GB.
+    mem_gb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 ** 3)
+    return max(1, mem_gb // 8)
+
 def build_llvm(install_dir):
     print("Configuring LLVM...")
 
@@ -74,15 +67,24 @@ def build_llvm(install_dir):
         # Run CMake to configure the build
         subprocess.run([
             "cmake",
+            "-G", "Ninja",
             "-S", "llvm-project/llvm",
             "-B", "llvm-project/build",
             "-DCMAKE_BUILD_TYPE=Release",
             "-DLLVM_ENABLE_PROJECTS=clang;lld;flang;openmp;clang-tools-extra",
-            "-DLLVM_FLANG_NEW_DRIVER=OFF"
+            "-DLLVM_FLANG_NEW_DRIVER=OFF",
+            "-DLLVM_TARGETS_TO_BUILD=host",
+            "-DLLVM_CCACHE_BUILD=ON",
+            "-DLLVM_USE_LINKER=lld",
+            "-DLLVM_BUILD_LLVM_DYLIB=ON",
+            "-DLLVM_LINK_LLVM_DYLIB=ON",
+            "-DLLVM_OPTIMIZED_TABLEGEN=ON",
+            "-DLLVM_USE_SPLIT_DWARF=ON",
+            f"-DLLVM_PARALLEL_LINK_JOBS={parallel_link_jobs()}"
         ], check=True)
 
         print("Building LLVM... This may take some time.")
-        subprocess.run(["cmake", "--build", "llvm-project/build", "-j64"], check=True)
+        subprocess.run(["cmake", "--build", "llvm-project/build", f"-j{os.cpu_count()}"], check=True)
 
         print("Installing LLVM...")
         subprocess.run(["cmake", "--install", "llvm-project/build", "--prefix", install_dir], check=True)
@@ -92,60 +94,14 @@ def build_llvm(install_dir):
         sys.exit(1)
 
 def create_module_file(version, install_dir):
-    modulefile_dir = os.path.expanduser(f"~/compiler_modulefiles/llvm")
-    os.makedirs(modulefile_dir, exist_ok=True)
-
-    modulefile_path = os.path.join(modulefile_dir, f"llvm-{version}")
-
-    try:
-        with open(modulefile_path, 'w') as f:
-            f.write(f"""#%Module1.0
-
-proc ModulesHelp {{ }} {{
-    global version modroot
-    puts stderr "LLVM version {version} - sets the environment for llvm-{version}"
-}}
-
-module-whatis "Sets the environment for LLVM version {version}"
-
-set topdir {install_dir}
-set version {version}
-
-setenv CC ${{topdir}}/bin/clang
-setenv CXX ${{topdir}}/bin/clang++
-setenv FC ${{topdir}}/bin/flang
-prepend-path PATH ${{topdir}}/bin
-prepend-path LD_LIBRARY_PATH ${{topdir}}/lib
-""")
-    except IOError as e:
-        print(f"Error creating module file: {e}")
-        sys.exit(1)
-
-def update_bashrc():
-    bashrc_path = os.path.expanduser("~/.bashrc")
-
-    try:
-        # Read existing .bashrc content to check for MODULEPATH
-        with open(bashrc_path, 'r') as bashrc:
-            content = bashrc.read()
-
-        # Append MODULEPATH if it doesn't exist
-        if 'export MODULEPATH' not in content:
-            with open(bashrc_path, 'a') as bashrc:
-                bashrc.write('export MODULEPATH=${MODULEPATH}:$HOME/compiler_modulefiles\n')
-                print("Added MODULEPATH to .bashrc.")
-
-                # Inform user to source .bashrc
-                print("Please run 'source ~/.bashrc' or restart your terminal to update your environment.")
-
-                return True
-        else:
-            print("MODULEPATH already exists in .bashrc.")
-            return False
-
-    except IOError as e:
-        print(f"Error updating .bashrc: {e}")
-        sys.exit(1)
+    write_modulefile("llvm", "LLVM", version, install_dir, setenv={
+        "CC": "${topdir}/bin/clang",
+        "CXX": "${topdir}/bin/clang++",
+        "FC": "${topdir}/bin/flang",
+    }, prepend_path={
+        "PATH": "${topdir}/bin",
+        "LD_LIBRARY_PATH": "${topdir}/lib",
+    })
 
 def main():
    if len(sys.argv) < 2:
@@ -168,14 +124,10 @@ def main():
    os.makedirs(install_dir, exist_ok=True)
 
    # Install required packages
-   install_packages()
-
-   # Install environment modules
-   install_environment_modules()
+   apt_install(REQUIRED_APT)
 
    # Download and extract LLVM.
    download_llvm(version)
-   extract_llvm(version)
 
    # Build and install LLVM.
    build_llvm(install_dir)